@@ -1,8 +1,9 @@
 import time
+import json
 import argparse
 from reeb_gen import generate_refined_reeb_graph
-from rgcn_solver import solve_rgcn_crossing_sat_local_levels
-from rgcn_opsolver import solve_rgcn_optimized
+from rgcn_control import ENGINES, result_status
+from rgcn_select import SOLVERS, instance_features
 import concurrent.futures
 
 
@@ -18,7 +19,7 @@ def run_with_timeout(func, args=(), kwargs=None, timeout=30):
             return 'TIMEOUT', timeout
 
 
-def run_benchmark(num_layers, layer_width, k, num_trials, seed_start=0, timeout=30):
+def run_benchmark(num_layers, layer_width, k, num_trials, seed_start=0, timeout=30, engines=("m22",)):
     results = []
     for trial in range(num_trials):
         seed = seed_start + trial
@@ -26,17 +27,14 @@ def run_benchmark(num_layers, layer_width, k, num_trials, seed_start=0, timeout=
         V = list(V_levels.keys())
         levels = V_levels
 
-        # Standard solver
-        t0 = time.time()
-        res1 = solve_rgcn_crossing_sat_local_levels(V, edges, levels, k)
-        t1 = time.time()
-        time1 = t1 - t0
-
-        # Optimized solver
-        t0 = time.time()
-        res2 = solve_rgcn_optimized(V, edges, levels, k)
-        t1 = time.time()
-        time2 = t1 - t0
+        # Every solver on every engine, keyed "solver/engine" for rgcn_select
+        res, times = {}, {}
+        for name, solver in SOLVERS.items():
+            for engine in engines:
+                t0 = time.time()
+                res[f"{name}/{engine}"] = solver(V, edges, levels, k, engine=engine, time_budget=timeout)
+                t1 = time.time()
+                times[f"{name}/{engine}"] = t1 - t0
 
         results.append({
             'trial': trial,
@@ -44,14 +42,24 @@ def run_benchmark(num_layers, layer_width, k, num_trials, seed_start=0, timeout=
             'n': len(V),
             'm': len(edges),
             'k': k,
-            'solver_result': res1,
-            'solver_time': time1,
-            'opsolver_result': res2,
-            'opsolver_time': time2
+            'solver_result': res[f"standard/{engines[0]}"],
+            'solver_time': times[f"standard/{engines[0]}"],
+            'opsolver_result': res[f"optimized/{engines[0]}"],
+            'opsolver_time': times[f"optimized/{engines[0]}"],
+            'features': instance_features(V, edges, levels, k),
+            'times': times,
+            'status': {c: result_status(r) for c, r in res.items()},
+            'time_budget': timeout,
         })
     return results
 
 
+def save_results(results, path):
+    # Records consumed by rgcn_select.train_selector
+    with open(path, "w") as f:
+        json.dump([{key: r[key] for key in ('seed', 'features', 'times', 'status', 'time_budget')} for r in results], f, indent=2)
+
+
 def print_results_table(results):
     print(f"{'trial':<5} {'n':<4} {'m':<4} {'k':<3} {'solver_time(s)':<16} {'opsolver_time(s)':<18} {'solver_result':<14} {'opsolver_result':<16}")
     for r in results:
@@ -65,10 +73,16 @@ def main():
     parser.add_argument('-k', type=int, default=0, help='Crossing number bound')
     parser.add_argument('--num_trials', type=int, default=5, help='Number of random graphs to test')
     parser.add_argument('--seed_start', type=int, default=0, help='Starting seed for random generation')
+    parser.add_argument('--timeout', type=float, default=30, help='Time budget per solve in seconds')
+    parser.add_argument('--engines', nargs='+', default=['m22'], choices=ENGINES, help='pysat engines to benchmark')
+    parser.add_argument('--save_results', type=str, default=None, help='Write per-instance features and times to this JSON file')
     args = parser.parse_args()
 
-    results = run_benchmark(args.num_layers, args.layer_width, args.k, args.num_trials, args.seed_start)
+    results = run_benchmark(args.num_layers, args.layer_width, args.k, args.num_trials, args.seed_start,
+                            args.timeout, args.engines)
     print_results_table(results)
+    if args.save_results:
+        save_results(results, args.save_results)
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
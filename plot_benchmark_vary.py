@@ -1,12 +1,16 @@
 import time
+import json
 import matplotlib.pyplot as plt
 from reeb_gen import generate_refined_reeb_graph
 from rgcn_solver import solve_rgcn_crossing_sat_local_levels
 from rgcn_opsolver import solve_rgcn_optimized
+from rgcn_select import instance_features
+from rgcn_control import result_status
 import argparse
 
 
-def benchmark_varying_param(param_name, param_values, fixed_params, k, num_trials=3):
+def benchmark_varying_param(param_name, param_values, fixed_params, k, num_trials=3, records=None,
+                            time_budget=30):
     avg_solver_times = []
     avg_opsolver_times = []
     for val in param_values:
@@ -24,23 +28,35 @@ def benchmark_varying_param(param_name, param_values, fixed_params, k, num_trial
             levels = V_levels
 
             # Standard solver
+            res1 = None
             t0 = time.time()
             try:
-                solve_rgcn_crossing_sat_local_levels(V, edges, levels, k)
+                res1 = solve_rgcn_crossing_sat_local_levels(V, edges, levels, k, time_budget=time_budget)
             except Exception:
                 pass
             t1 = time.time()
             solver_times.append(t1 - t0)
 
             # Optimized solver
+            res2 = None
             t0 = time.time()
             try:
-                solve_rgcn_optimized(V, edges, levels, k)
+                res2 = solve_rgcn_optimized(V, edges, levels, k, time_budget=time_budget)
             except Exception:
                 pass
             t1 = time.time()
             opsolver_times.append(t1 - t0)
 
+            # Records for rgcn_select.train_selector, which scores UNKNOWN and FAILED runs with PAR-2
+            if records is not None:
+                times, status = {}, {}
+                for choice, res, t in (("standard/m22", res1, solver_times[-1]),
+                                       ("optimized/m22", res2, opsolver_times[-1])):
+                    times[choice] = t
+                    status[choice] = 'FAILED' if res is None else result_status(res)
+                records.append({'seed': trial, 'features': instance_features(V, edges, levels, k),
+                                'times': times, 'status': status, 'time_budget': time_budget})
+
         avg_solver_times.append(sum(solver_times) / num_trials)
         avg_opsolver_times.append(sum(opsolver_times) / num_trials)
 
@@ -57,7 +73,10 @@ if __name__ == '__main__':
     parser.add_argument('--fixed_num_layers', type=int, default=4, help='Fixed num_layers (if not sweeping)')
     parser.add_argument('--fixed_k', type=int, default=0, help='Fixed k (if not sweeping)')
     parser.add_argument('--num_trials', type=int, default=3, help='Number of trials per setting')
+    parser.add_argument('--time_budget', type=float, default=30, help='Time budget per solve in seconds')
+    parser.add_argument('--save_results', type=str, default=None, help='Write per-instance features and times to this JSON file')
     args = parser.parse_args()
+    records = [] if args.save_results else None
 
     param_name = args.sweep_param
     param_values = list(range(args.sweep_start, args.sweep_end + 1))
@@ -76,18 +95,24 @@ if __name__ == '__main__':
     avg_opsolver_times = []
     if param_name == 'k':
         for val in param_values:
-            t1, t2 = benchmark_varying_param(param_name, [val], fixed_params, val, num_trials=args.num_trials)
+            t1, t2 = benchmark_varying_param(param_name, [val], fixed_params, val, num_trials=args.num_trials,
+                                             records=records, time_budget=args.time_budget)
             avg_solver_times.extend(t1)
             avg_opsolver_times.extend(t2)
     else:
         avg_solver_times, avg_opsolver_times = benchmark_varying_param(
-            param_name, param_values, fixed_params, k, num_trials=args.num_trials
+            param_name, param_values, fixed_params, k, num_trials=args.num_trials, records=records,
+            time_budget=args.time_budget
         )
 
     print(f"{param_name:<12} {'avg_solver_time(s)':<20} {'avg_opsolver_time(s)':<22}")
     for v, t1, t2 in zip(param_values, avg_solver_times, avg_opsolver_times):
         print(f"{v:<12} {t1:<20.4f} {t2:<22.4f}")
 
+    if records is not None:
+        with open(args.save_results, 'w') as f:
+            json.dump(records, f, indent=2)
+
     plt.plot(param_values, avg_solver_times, marker='o', label='Standard Solver')
     plt.plot(param_values, avg_opsolver_times, marker='s', label='Optimized Solver')
     plt.xlabel(param_name)
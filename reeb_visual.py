@@ -1,13 +1,51 @@
 # rgcn_visualizer.py
 import json
 import matplotlib.pyplot as plt
-import networkx as nx
+import numpy as np
+from matplotlib.collections import LineCollection
 from collections import defaultdict
 from datetime import datetime
 import os
+from rgcn_layout import assignment_to_order, crossing_pairs
 
 
-def visualize_reeb_graph(V_levels, edges, show_degrees=True, save_path=None):
+def _layout_positions(V_levels, assignment=None, x_gap=2, y_gap=-2):
+    """
+    Compute (x, y) drawing coordinates for every vertex.
+
+    Without an assignment, vertices are placed by sorted id within each level.
+    With a solver assignment (vertex -> slot), vertices are placed in the
+    drawing order given by rgcn_layout.assignment_to_order, so the drawn
+    crossings match the solver's count.
+    """
+    if assignment is None:
+        order = defaultdict(list)
+        for v in sorted(V_levels):
+            order[V_levels[v]].append(v)
+    else:
+        order = assignment_to_order(assignment, V_levels)
+
+    pos = {}
+    for lvl, nodes in order.items():
+        for i, v in enumerate(nodes):
+            pos[v] = (i * x_gap, lvl * y_gap)
+    return pos
+
+
+def find_crossing_pairs(edges, pos, V_levels):
+    """
+    Return the list of edge index pairs (i, j) that cross in the given layout.
+
+    Only edges spanning the same pair of levels are compared, matching the
+    solvers' crossing definition.
+    """
+    return crossing_pairs(edges, {v: p[0] for v, p in pos.items()}, V_levels)
+
+
+def visualize_reeb_graph(V_levels, edges, show_degrees=True, save_path=None,
+                         assignment=None, highlight_crossings=False,
+                         level_range=None, viewport=None,
+                         label_threshold=200, rasterize_threshold=2000):
     """
     Visualize refined Reeb graph and optionally save to file.
 
@@ -16,42 +54,82 @@ def visualize_reeb_graph(V_levels, edges, show_degrees=True, save_path=None):
         - edges: list of (u,v)
         - show_degrees: bool, whether to annotate node degrees
         - save_path: str, path prefix to save PNG and PDF
+        - assignment: dict of vertex -> slot as returned by the solvers with
+          extract_solution=True; vertices are laid out by sorted id if None
+        - highlight_crossings: bool, whether to draw crossing edges in red
+        - level_range: (lo, hi) inclusive range of levels to draw
+        - viewport: (xmin, xmax, ymin, ymax) in drawing coordinates to crop to
+        - label_threshold: skip node labels and degrees above this many vertices
+        - rasterize_threshold: rasterize nodes and edges above this many artists
     """
-    G = nx.DiGraph()
-    pos = {}
-    layer_nodes = defaultdict(list)
-    deg_map = defaultdict(int)
-
-    for v, lvl in V_levels.items():
-        layer_nodes[lvl].append(v)
+    pos = _layout_positions(V_levels, assignment)
 
+    deg_map = defaultdict(int)
     for u, v in edges:
         deg_map[u] += 1
         deg_map[v] += 1
-        G.add_edge(u, v)
 
-    # Assign layout positions
-    x_gap = 2
-    y_gap = -2
-    for lvl, nodes in sorted(layer_nodes.items()):
-        nodes = sorted(nodes)
-        for i, v in enumerate(nodes):
-            pos[v] = (i * x_gap, lvl * y_gap)
+    # Crop to the requested levels and viewport
+    visible = set(V_levels)
+    if level_range is not None:
+        lo, hi = level_range
+        visible = {v for v in visible if lo <= V_levels[v] <= hi}
+    if viewport is not None:
+        xmin, xmax, ymin, ymax = viewport
+        visible = {v for v in visible
+                   if xmin <= pos[v][0] <= xmax and ymin <= pos[v][1] <= ymax}
+
+    pairs = find_crossing_pairs(edges, pos, V_levels) if highlight_crossings else []
+    crossing_edges = set()
+    for i, j in pairs:
+        crossing_edges.add(i)
+        crossing_edges.add(j)
+
+    if level_range is not None:
+        drawn = [i for i, (u, v) in enumerate(edges)
+                 if lo <= V_levels[u] <= hi and lo <= V_levels[v] <= hi
+                 and (u in visible or v in visible)]
+    else:
+        drawn = [i for i, (u, v) in enumerate(edges) if u in visible or v in visible]
+    nodes = sorted(visible)
 
     fig, ax = plt.subplots(figsize=(10, 6))
 
-    # Draw graph
-    nx.draw_networkx_nodes(G, pos, node_size=500, node_color="skyblue", ax=ax)
-    nx.draw_networkx_labels(G, pos, labels={v: str(v) for v in G.nodes()}, font_size=10, ax=ax)
-
-    if show_degrees:
-        for v in G.nodes():
-            x, y = pos[v]
-            ax.text(x, y + 0.4, f"deg={deg_map[v]}", fontsize=8, ha="center", color="darkgreen")
-
-    nx.draw_networkx_edges(G, pos, edgelist=edges, edge_color="black", arrows=False, ax=ax)
+    # Draw edges as one collection, crossing edges on top
+    plain = [i for i in drawn if i not in crossing_edges]
+    crossed = [i for i in drawn if i in crossing_edges]
+    for subset, color, width, z in ((plain, "black", 1.0, 1), (crossed, "red", 1.5, 2)):
+        if not subset:
+            continue
+        segments = [(pos[edges[i][0]], pos[edges[i][1]]) for i in subset]
+        lines = LineCollection(segments, colors=color, linewidths=width, zorder=z)
+        lines.set_rasterized(len(segments) > rasterize_threshold)
+        ax.add_collection(lines)
+
+    # Draw nodes as a single scatter
+    if nodes:
+        xy = np.array([pos[v] for v in nodes])
+        small = len(nodes) <= label_threshold
+        ax.scatter(xy[:, 0], xy[:, 1], s=500 if small else 10, c="skyblue", zorder=3,
+                   rasterized=len(nodes) > rasterize_threshold)
+
+        if small:
+            for v in nodes:
+                x, y = pos[v]
+                ax.text(x, y, str(v), fontsize=10, ha="center", va="center", zorder=4)
+                if show_degrees:
+                    ax.text(x, y + 0.4, f"deg={deg_map[v]}", fontsize=8, ha="center", color="darkgreen")
+
+    if viewport is not None:
+        ax.set_xlim(xmin, xmax)
+        ax.set_ylim(ymin, ymax)
+    else:
+        ax.autoscale_view()
 
-    ax.set_title("Refined Reeb Graph")
+    title = "Refined Reeb Graph"
+    if highlight_crossings:
+        title += f" ({len(pairs)} crossings)"
+    ax.set_title(title)
     ax.set_axis_off()
     plt.tight_layout()
 
@@ -75,5 +153,8 @@ if __name__ == "__main__":
 
     V = {int(k): v for k, v in data["V_levels"].items()}
     E = [tuple(e) for e in data["edges"]]
+    # Optional solver ordering stored alongside the graph
+    A = {int(k): v for k, v in data["assignment"].items()} if "assignment" in data else None
 
-    visualize_reeb_graph(V, E, show_degrees=True, save_path="reeb_graph")
+    visualize_reeb_graph(V, E, show_degrees=True, save_path="reeb_graph",
+                         assignment=A, highlight_crossings=A is not None)
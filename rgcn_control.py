@@ -0,0 +1,117 @@
+# rgcn_control.py
+import threading
+import time
+
+
+# pysat engines that support solve_limited, conf_budget and interrupt, which
+# the budgets rely on (CaDiCaL and Lingeling do not)
+ENGINES = ("m22", "mgh", "mc", "mcb", "mcm", "mpl", "g3", "g4", "g41", "gc3", "gc4")
+
+
+class Unknown:
+    """
+    Result of a solve that stopped on a budget or cancellation before deciding.
+
+    Unknown is falsy so that callers checking `if result:` never mistake it
+    for a satisfiable answer; use `isinstance(result, Unknown)` to tell it
+    apart from an unsatisfiable one.
+    """
+    status = "UNKNOWN"
+
+    def __init__(self, reason, stats, elapsed):
+        self.reason = reason      # "time_budget", "conflict_budget" or "cancelled"
+        self.stats = stats        # partial solver statistics, empty if stopped while encoding
+        self.elapsed = elapsed    # seconds spent before stopping
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return f"Unknown(reason={self.reason!r}, elapsed={self.elapsed:.3f}, stats={self.stats})"
+
+
+def result_status(res):
+    """
+    Status of a solver result for benchmark records: "SAT", "UNSAT" or "UNKNOWN".
+    """
+    if isinstance(res, Unknown):
+        return "UNKNOWN"
+    return "SAT" if res else "UNSAT"
+
+
+def make_stop_check(deadline=None, cancel=None):
+    """
+    Return a function giving the reason to stop ("cancelled", "time_budget") or None.
+
+    Parameters:
+        - deadline: time.monotonic() value after which work should stop
+        - cancel: threading.Event set by the caller to request cancellation
+    """
+    def stop_reason():
+        if cancel is not None and cancel.is_set():
+            return "cancelled"
+        if deadline is not None and time.monotonic() >= deadline:
+            return "time_budget"
+        return None
+    return stop_reason
+
+
+def solve_with_budget(solver, stop_reason, deadline=None, conflict_budget=None,
+                      on_solve=None, chunk=10000, cancel=None):
+    """
+    Run solver.solve_limited() in chunks of `chunk` conflicts.
+
+    Solver statistics are passed to on_solve after every chunk. A timer
+    interrupts the solver at the deadline, and a watcher thread interrupts
+    it as soon as `cancel` is set, so neither waits for a chunk to finish.
+
+    Returns (True/False, stats) when the solver decides, or (reason, stats)
+    when it stops on a budget or cancellation.
+    """
+    timer = None
+    if deadline is not None:
+        timer = threading.Timer(max(0.0, deadline - time.monotonic()), solver.interrupt)
+        timer.daemon = True
+        timer.start()
+
+    done = threading.Event()
+    watcher = None
+    if cancel is not None:
+        def watch():
+            while not done.is_set():
+                if cancel.wait(0.05):
+                    solver.interrupt()
+                    return
+        watcher = threading.Thread(target=watch, daemon=True)
+        watcher.start()
+
+    try:
+        stats = solver.accum_stats()
+        while True:
+            reason = stop_reason()
+            if reason:
+                return reason, stats
+
+            step = chunk
+            if conflict_budget is not None:
+                step = min(chunk, conflict_budget - stats["conflicts"])
+                if step <= 0:
+                    return "conflict_budget", stats
+
+            solver.conf_budget(step)
+            res = solver.solve_limited(expect_interrupt=True)
+            stats = solver.accum_stats()
+            if on_solve:
+                on_solve(stats)
+            if res is not None:
+                return res, stats
+            solver.clear_interrupt()
+    finally:
+        # Stop the helpers, and wait for any interrupt already under way,
+        # before the caller deletes the solver
+        done.set()
+        if watcher is not None:
+            watcher.join()
+        if timer is not None:
+            timer.cancel()
+            timer.join()
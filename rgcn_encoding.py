@@ -0,0 +1,147 @@
+# rgcn_encoding.py
+import hashlib
+import json
+from pysat.formula import CNF, WCNF
+from pysat.card import CardEnc
+
+
+def instance_key(V, edges, levels):
+    """
+    Hash identifying an instance, so a saved encoding is only reused for the same graph.
+    """
+    data = {
+        "V": sorted((repr(v), repr(levels[v])) for v in V),
+        "edges": sorted((repr(u), repr(v)) for u, v in edges),
+    }
+    return hashlib.sha256(json.dumps(data).encode()).hexdigest()
+
+
+def make_encoding(cnf, pool, crossing_vars, slot_ranges, V, edges, levels, encoder):
+    """
+    Bundle a k-independent RGCN encoding into a plain dict.
+
+    The cardinality bound is not part of the stored clauses, so the same
+    encoding can be solved or exported for any k. `encoder` names the
+    function that built it, since the solvers' encodings are not
+    interchangeable.
+    """
+    return {
+        "clauses": cnf.clauses,
+        "var_map": {str(name): vid for name, vid in pool.obj2id.items()},
+        "crossing_vars": crossing_vars,
+        "slot_ranges": {v: tuple(r) for v, r in slot_ranges.items()},
+        "top": pool.top,
+        "instance": instance_key(V, edges, levels),
+        "encoder": encoder,
+    }
+
+
+def bounded_clauses(encoding, k):
+    """
+    Return the encoding's clauses plus an at-most-k bound on crossing variables.
+    """
+    card = CardEnc.atmost(lits=encoding["crossing_vars"], bound=k,
+                          top_id=encoding["top"], encoding=1)
+    return encoding["clauses"] + card.clauses
+
+
+def extract_assignment(encoding, model, V):
+    """
+    Read the slot of every vertex from a SAT model.
+    """
+    true_lits = set(lit for lit in model if lit > 0)
+    var_map = encoding["var_map"]
+    assignment = {}
+    for v in V:
+        start, end = encoding["slot_ranges"][v]
+        for i in range(start, end + 1):
+            if var_map.get(f"p_{v}_{i}") in true_lits:
+                assignment[v] = i
+                break
+    return assignment
+
+
+def _vars_path(path):
+    # Keyed on the full file name so instance.cnf and instance.wcnf do not share a map
+    return path + ".vars.json"
+
+
+def _write_var_map(path, encoding, kind, **extra):
+    meta = {
+        "kind": kind,
+        "var_map": encoding["var_map"],
+        "crossing_vars": encoding["crossing_vars"],
+        "slot_ranges": {str(v): list(r) for v, r in encoding["slot_ranges"].items()},
+        "top": encoding["top"],
+        "instance": encoding["instance"],
+        "encoder": encoding["encoder"],
+    }
+    meta.update(extra)
+    with open(_vars_path(path), "w") as f:
+        json.dump(meta, f)
+
+
+def save_encoding(path, encoding):
+    """
+    Save the k-independent clauses as DIMACS CNF plus a `.vars.json` variable map.
+    """
+    CNF(from_clauses=encoding["clauses"]).to_file(path)
+    _write_var_map(path, encoding, "encoding")
+
+
+def export_dimacs(path, encoding, k):
+    """
+    Write the decision formula "at most k crossings" as DIMACS CNF for standalone SAT solvers.
+    """
+    CNF(from_clauses=bounded_clauses(encoding, k)).to_file(
+        path, comments=[f"c RGCN decision instance, k={k}"])
+    _write_var_map(path, encoding, "decision", k=k)
+
+
+def export_wcnf(path, encoding):
+    """
+    Write the optimization formula as WCNF: the encoding is hard, and every
+    crossing variable gets a unit soft clause of weight 1 forbidding it.
+    """
+    wcnf = WCNF()
+    wcnf.extend(encoding["clauses"])
+    for c in encoding["crossing_vars"]:
+        wcnf.append([-c], weight=1)
+    wcnf.to_file(path, comments=["c RGCN crossing minimization instance"])
+    _write_var_map(path, encoding, "wcnf")
+
+
+def load_encoding(path, V=None, edges=None, levels=None, encoder=None):
+    """
+    Load an encoding written by save_encoding.
+
+    Raises ValueError for files written by export_dimacs or export_wcnf,
+    which already contain a bound or soft clauses, and, when the instance
+    (V, edges and levels together) or encoder is given, for encodings of a
+    different graph or encoder.
+    """
+    given = [x is not None for x in (V, edges, levels)]
+    if any(given) and not all(given):
+        raise ValueError("V, edges and levels must be given together to check the instance")
+    with open(_vars_path(path)) as f:
+        meta = json.load(f)
+    if meta.get("kind") != "encoding" or "k" in meta:
+        raise ValueError(f"{path} is a {meta.get('kind')} export, not a reusable encoding")
+    if V is not None and meta["instance"] != instance_key(V, edges, levels):
+        raise ValueError(f"Encoding {path} was built for a different instance")
+    if encoder is not None and meta["encoder"] != encoder:
+        raise ValueError(f"Encoding {path} was built by {meta['encoder']}, not {encoder}")
+
+    slot_ranges = {}
+    for v, r in meta["slot_ranges"].items():
+        slot_ranges[int(v) if v.lstrip("-").isdigit() else v] = tuple(r)
+
+    return {
+        "clauses": CNF(from_file=path).clauses,
+        "var_map": meta["var_map"],
+        "crossing_vars": meta["crossing_vars"],
+        "slot_ranges": slot_ranges,
+        "top": meta["top"],
+        "instance": meta["instance"],
+        "encoder": meta["encoder"],
+    }
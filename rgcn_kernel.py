@@ -0,0 +1,480 @@
+# rgcn_kernel.py
+import itertools
+from collections import defaultdict, deque
+from rgcn_opsolver import solve_rgcn_optimized
+from rgcn_layout import assignment_to_order, order_to_assignment
+from rgcn_select import (barycenter_order, components, crossing_lower_bound, edge_groups,
+                         is_proper_layering, level_pair_lower_bounds)
+
+
+def _fix(succ, pred, a, b):
+    """
+    Record "a before b" with its transitive consequences. Returns False if
+    the opposite order is already fixed.
+    """
+    if a == b or a in succ[b]:
+        return False
+    if b in succ[a]:
+        return True
+    for x in list(pred[a]) + [a]:
+        for y in list(succ[b]) + [b]:
+            succ[x].add(y)
+            pred[y].add(x)
+    return True
+
+
+def _settle(groups, succ):
+    """
+    Return (forced, settled): the number of edge pairs per group that must
+    cross under the fixed orders, and the set of all edge pairs whose
+    crossing is decided.
+    """
+    forced, settled = defaultdict(int), set()
+    for key, group in groups.items():
+        for e1, e2 in itertools.combinations(group, 2):
+            (u1, v1), (u2, v2) = e1, e2
+            if u1 == u2 or v1 == v2:
+                settled.add(frozenset((e1, e2)))  # shared endpoint, never crosses
+                continue
+            u_known = u2 in succ[u1] or u1 in succ[u2]
+            v_known = v2 in succ[v1] or v1 in succ[v2]
+            if u_known and v_known:
+                settled.add(frozenset((e1, e2)))
+                if (u2 in succ[u1]) == (v2 in succ[v1]):
+                    forced[key] += 1
+    return forced, settled
+
+
+def _link_graph(groups):
+    """
+    Link every two vertex-disjoint edges (a, b), (c, d) of a group as an
+    edge between the same-level vertex pairs (a, c) and (b, d).
+
+    Pairs are stored as (x, y) with x < y. A link (P, Q, parity, key) says
+    that "P[0] before P[1]" xor "Q[0] before Q[1]" equals parity unless the
+    two edges of group `key` cross, since the solvers count an edge pair as
+    crossing when both endpoint pairs keep the same slot order. Returns
+    (links, adj) where adj maps a pair to the indices of its links.
+    """
+    links, adj = [], defaultdict(list)
+    for key, group in groups.items():
+        for (a, b), (c, d) in itertools.combinations(group, 2):
+            if a == c or b == d:
+                continue
+            P, Q = (min(a, c), max(a, c)), (min(b, d), max(b, d))
+            adj[P].append(len(links))
+            adj[Q].append(len(links))
+            links.append((P, Q, int((a > c) == (b > d)), key))
+    return links, adj
+
+
+def _path_parities(links, adj, s, t):
+    """
+    (parity, edge groups used) of each path in a maximum set of
+    link-disjoint paths from pair s to pair t, found with unit-capacity
+    augmenting paths.
+    """
+    def other(lid, x):
+        P, Q = links[lid][:2]
+        return Q if x == P else P
+
+    used = {}  # link index -> pair its flow leaves from
+    while True:
+        prev, queue = {s: None}, deque([s])
+        while queue and t not in prev:
+            x = queue.popleft()
+            for lid in adj[x]:
+                y = other(lid, x)
+                # Free links, or links whose flow runs y -> x and can be cancelled
+                if y not in prev and used.get(lid, y) == y:
+                    prev[y] = lid
+                    queue.append(y)
+        if t not in prev:
+            break
+        y = t
+        while y != s:
+            lid = prev[y]
+            x = other(lid, y)
+            if used.get(lid) == y:
+                del used[lid]
+            else:
+                used[lid] = x
+            y = x
+
+    out = defaultdict(list)
+    for lid, x in used.items():
+        out[x].append(lid)
+    paths = []
+    while out[s]:
+        x, parity, keys = s, 0, set()
+        while x != t:
+            lid = out[x].pop()
+            parity ^= links[lid][2]
+            keys.add(links[lid][3])
+            x = other(lid, x)
+        paths.append((parity, keys))
+    return paths
+
+
+def kernelize(V, edges, levels, k):
+    """
+    Reduce an "at most k crossings" instance before it reaches the SAT solver.
+
+    - Components are independent and can be placed side by side, so any
+      component whose barycenter drawing meets its 4-cycle lower bound is
+      settled at that cost and removed, and the budget drops accordingly.
+    - Orders that lose no generality are fixed: one vertex pair per
+      remaining component (mirroring a component keeps its crossings), and
+      twin vertices with identical neighbourhoods in id order.
+    - Every two vertex-disjoint edges of a level pair link their upper and
+      lower vertex pairs: unless the edges cross, the two pairs keep a
+      fixed relative orientation. A pair joined to the component's fixed
+      pair by link-disjoint paths of one parity is oriented accordingly
+      when breaking one link per path, beyond what the static lower bounds
+      of the groups on those paths already count, exceeds k. The fixed
+      pair is chosen among those with the most links.
+    - A vertex pair is then oriented whenever the other order would push
+      the crossings past the budget. Per pair of levels this counts the
+      larger of the static lower bound and the crossings already forced by
+      fixed orders plus one per 4-cycle not yet fully ordered. This repeats
+      until nothing changes.
+    - Edge pairs whose crossing is decided are dropped; forced crossings are
+      taken off the budget.
+
+    Returns a dict with "status" True/False when the kernel decides the
+    instance, or None with the reduced instance ("V", "edges", "levels",
+    "k", "fixed_order", "settled_pairs") for solve_rgcn_optimized. "blocks"
+    holds the drawing orders (level -> vertices left to right) of the
+    settled components.
+    """
+    edges = [tuple(e) for e in edges]
+    unreduced = {"status": None, "V": list(V), "edges": edges, "levels": levels, "k": k,
+                 "fixed_order": [], "settled_pairs": set(), "blocks": []}
+    if k < 0:
+        return {"status": False}
+    # The bounds, side-by-side and mirror arguments need every edge to run
+    # down to the next level; anything else goes to the solver unreduced
+    if not is_proper_layering(V, edges, levels):
+        return unreduced
+
+    comp_of = {}
+    comps = components(V, edges)
+    for c, Vc in enumerate(comps):
+        for v in Vc:
+            comp_of[v] = c
+    comp_edges = defaultdict(list)
+    for u, v in edges:
+        comp_edges[comp_of[u]].append((u, v))
+
+    # Step 1: bounds per component
+    info = []
+    for c, Vc in enumerate(comps):
+        order, heuristic = barycenter_order(Vc, comp_edges[c], levels)
+        info.append((crossing_lower_bound(comp_edges[c], levels), heuristic, order))
+
+    if sum(lb for lb, _, _ in info) > k:
+        return {"status": False}
+    if sum(h for _, h, _ in info) <= k:
+        return {"status": True, "blocks": [order for _, _, order in info]}
+
+    blocks, open_comps, k_rem = [], [], k
+    for c, (lb, heuristic, order) in enumerate(info):
+        if heuristic == lb:
+            blocks.append(order)
+            k_rem -= heuristic
+        else:
+            open_comps.append(c)
+
+    open_V = [v for c in open_comps for v in comps[c]]
+    open_E = [e for c in open_comps for e in comp_edges[c]]
+    out_nbrs, in_nbrs = defaultdict(list), defaultdict(list)
+    for u, v in open_E:
+        out_nbrs[u].append(v)
+        in_nbrs[v].append(u)
+
+    # Step 2: orders fixed without loss of generality
+    succ, pred = defaultdict(set), defaultdict(set)
+    twin_classes = defaultdict(list)
+    for v in open_V:
+        twin_classes[(levels[v], frozenset(out_nbrs[v]), frozenset(in_nbrs[v]))].append(v)
+    twins = set()
+    for members in twin_classes.values():
+        if len(members) > 1:
+            members.sort()
+            twins.update(members)
+            for a, b in zip(members, members[1:]):
+                _fix(succ, pred, a, b)
+
+    groups = edge_groups(open_E, levels)
+    static = level_pair_lower_bounds(open_E, levels)
+    total_static = sum(static.values())
+    links, adj = _link_graph(groups)
+    for c in open_comps:
+        seeds = sorted(p for p in adj if comp_of[p[0]] == c and p[0] not in twins and p[1] not in twins)
+        if not seeds:
+            by_level = defaultdict(list)
+            for v in comps[c]:
+                if v not in twins:
+                    by_level[levels[v]].append(v)
+            seeds = [tuple(sorted(nodes)[:2]) for lvl, nodes in sorted(by_level.items()) if len(nodes) > 1]
+            if seeds:
+                _fix(succ, pred, *seeds[0])
+            continue
+        seed = max(seeds, key=lambda p: len(adj[p]))
+        _fix(succ, pred, *seed)
+
+        # Step 2b: orient pairs tied to the seed. Against a parity, each of
+        # its paths needs a crossing on one of its links, and an edge group
+        # can count at most its lower bound of those towards that bound
+        for q in sorted(adj):
+            if q == seed or comp_of[q[0]] != c or len(adj[q]) + total_static <= k_rem:
+                continue
+            paths = _path_parities(links, adj, seed, q)
+            for parity in (0, 1):
+                through = defaultdict(int)
+                for p, keys in paths:
+                    if p == parity:
+                        for key in keys:
+                            through[key] += 1
+                absorbed = sum(min(static[key], n) for key, n in through.items())
+                needed = total_static + max(0, sum(p == parity for p, _ in paths) - absorbed)
+                if needed > k_rem:
+                    # seed[0] is before seed[1], so q keeps its order iff the parity is even
+                    a, b = q if parity == 0 else q[::-1]
+                    if not _fix(succ, pred, a, b):
+                        return {"status": False}
+
+    # Step 3: orient pairs whose other order alone would exceed the budget
+    def pair_costs(u, w):
+        # Per edge group: crossings forced by fixed neighbour orders if u is
+        # before w, and if w is before u
+        costs = {}
+        for nbrs, key_of in ((out_nbrs, lambda a: (levels[u], levels[a])),
+                             (in_nbrs, lambda a: (levels[a], levels[u]))):
+            for a in nbrs[u]:
+                for b in nbrs[w]:
+                    if a == b or levels[a] != levels[b]:
+                        continue
+                    cost = costs.setdefault(key_of(a), [0, 0])
+                    if b in succ[a]:
+                        cost[0] += 1  # u before w keeps the same order as a before b
+                    elif a in succ[b]:
+                        cost[1] += 1
+        return costs
+
+    # Every 4-cycle (upper pair, lower pair) forces exactly one crossing,
+    # and distinct cycles force distinct edge pairs
+    cycles, on_pair = [], defaultdict(int)
+    for key, group in groups.items():
+        uppers = defaultdict(set)
+        for u, v in group:
+            uppers[v].add(u)
+        shared = defaultdict(list)
+        for v, us in uppers.items():
+            for p in itertools.combinations(sorted(us), 2):
+                shared[p].append(v)
+        for p, vs in shared.items():
+            for q in itertools.combinations(sorted(vs), 2):
+                cycles.append((key, p, q))
+                on_pair[(key, p)] += 1
+                on_pair[(key, q)] += 1
+
+    def is_fixed(p):
+        return p[1] in succ[p[0]] or p[0] in succ[p[1]]
+
+    level_nodes = defaultdict(list)
+    for v in open_V:
+        level_nodes[levels[v]].append(v)
+    pairs = [p for nodes in level_nodes.values() for p in itertools.combinations(sorted(nodes), 2)]
+
+    while True:
+        # Per group, the static bound or forced crossings plus open 4-cycles
+        forced, _ = _settle(groups, succ)
+        open_cycles = defaultdict(int)
+        for key, p, q in cycles:
+            if not (is_fixed(p) and is_fixed(q)):
+                open_cycles[key] += 1
+        bound = {key: max(static[key], forced[key] + open_cycles[key]) for key in groups}
+        total = sum(bound.values())
+        if total > k_rem:
+            return {"status": False}
+
+        changed = False
+        for u, w in pairs:
+            if w in succ[u] or u in succ[w]:
+                continue
+            costs = pair_costs(u, w)
+            if not costs:
+                continue
+            # Cycles on (u, w) are among the edge pairs pair_costs looks at
+            rest = total - sum(bound[key] for key in costs)
+            with_uw, with_wu = rest, rest
+            for key, (cost_uw, cost_wu) in costs.items():
+                base = forced[key] + open_cycles[key] - on_pair[(key, (u, w))]
+                with_uw += max(static[key], base + cost_uw)
+                with_wu += max(static[key], base + cost_wu)
+            if with_uw > k_rem:
+                if with_wu > k_rem or not _fix(succ, pred, w, u):
+                    return {"status": False}
+                changed = True
+            elif with_wu > k_rem:
+                if not _fix(succ, pred, u, w):
+                    return {"status": False}
+                changed = True
+        if not changed:
+            break
+
+    # Step 4: drop decided edge pairs
+    forced, settled = _settle(groups, succ)
+    return {
+        "status": None,
+        "V": open_V,
+        "edges": open_E,
+        "levels": {v: levels[v] for v in open_V},
+        "k": k_rem - sum(forced.values()),
+        "fixed_order": [(a, b) for a in succ for b in succ[a]],
+        "settled_pairs": settled,
+        "blocks": blocks,
+    }
+
+
+def _merge_blocks(blocks):
+    """
+    Place drawing orders side by side and return the solver-style assignment.
+    """
+    order = defaultdict(list)
+    for block in blocks:
+        for lvl, nodes in block.items():
+            order[lvl].extend(nodes)
+    return order_to_assignment(order)
+
+
+def solve_rgcn_kernelized(V, edges, levels, k, extract_solution=False, **kwargs):
+    """
+    Kernelize the instance for small k, then solve what remains with
+    solve_rgcn_optimized. Takes the same keyword arguments except
+    encoding_path, since the reduced encoding depends on k; an assignment
+    covers all of V.
+    """
+    kernel = kernelize(V, edges, levels, k)
+    if kernel["status"] is False:
+        return False
+
+    on_solution = kwargs.pop("on_solution", None)
+    blocks = kernel["blocks"]
+    if kernel["status"] is None:
+        res = solve_rgcn_optimized(kernel["V"], kernel["edges"], kernel["levels"], kernel["k"],
+                                   extract_solution=extract_solution or on_solution is not None,
+                                   fixed_order=kernel["fixed_order"],
+                                   settled_pairs=kernel["settled_pairs"], **kwargs)
+        if not res:
+            return res
+        if res is True:
+            return True
+
+        blocks = blocks + [assignment_to_order(res, levels)]
+    elif not extract_solution and on_solution is None:
+        return True
+
+    assignment = _merge_blocks(blocks)
+    if on_solution:
+        on_solution(assignment)
+    return assignment if extract_solution else True
+
+if __name__ == '__main__':
+    # Define test cases
+    tests = [
+        {
+            "name": "Test A: Non-crossing 3 edges",
+            "V": list(range(6)),
+            "edges": [(0, 3), (1, 4), (2, 5)],
+            "levels": {0: 0, 1: 0, 2: 0, 3: 1, 4: 1, 5: 1},
+            "k": 0,
+            "expect_sat": True
+        },
+        {
+            "name": "Test B: cross",
+            "V": list(range(4)),
+            "edges": [(0, 3), (0, 2), (1, 2), (1, 3)],
+            "levels": {0: 0, 1: 0, 2: 1, 3: 1},
+            "k": 0,
+            "expect_sat": False
+        },
+        {
+            "name": "Test B': 1 cross",
+            "V": list(range(4)),
+            "edges": [(0, 3), (0, 2), (1, 2), (1, 3)],
+            "levels": {0: 0, 1: 0, 2: 1, 3: 1},
+            "k": 1,
+            "expect_sat": True
+        },
+        {
+            "name": "Test C: Partial crossings allowed",
+            "V": list(range(6)),
+            "edges": [(0, 3), (0, 5), (1, 4), (2, 3), (2, 5)],
+            "levels": {0: 0, 1: 0, 2: 0, 3: 1, 4: 1, 5: 1},
+            "k": 1,
+            "expect_sat": True
+        },
+        {
+            "name": "Test C': 3 crosses",
+            "V": list(range(6)),
+            "edges": [(0, 3), (0, 5), (1, 4), (2, 3), (2, 5)],
+            "levels": {0: 0, 1: 0, 2: 0, 3: 1, 4: 1, 5: 1},
+            "k": 0,
+            "expect_sat": False
+        },
+        {
+            "name": "Test D: ",
+            "V": list(range(6)),
+            "edges": [(0, 3), (0, 2), (1, 2), (1, 3), (2, 5),(3, 4)],
+            "levels": {0: 0, 1: 0, 2: 1, 3: 1, 4: 2, 5: 2},
+            "k": 0,
+            "expect_sat": False
+        },
+        {
+            "name": "Test D': ",
+            "V": list(range(6)),
+            "edges": [(0, 3), (0, 2), (1, 2), (1, 3), (2, 5),(3, 4)],
+            "levels": {0: 0, 1: 0, 2: 1, 3: 1, 4: 2, 5: 2},
+            "k": 1,
+            "expect_sat": True
+        },
+    ]
+
+    results = []
+    for test in tests:
+        res = solve_rgcn_kernelized(
+            test["V"], test["edges"], test["levels"], test["k"])
+        passed = res == test["expect_sat"]
+        results.append({
+            "Test": test["name"],
+            "Expected": test["expect_sat"],
+            "Result": res,
+            "Status": "✅ PASSED" if passed else "❌ FAILED"
+        })
+
+    # Generated instances the kernel leaves to the SAT solver: the answer
+    # must match solve_rgcn_optimized and a returned assignment must draw
+    # with at most k crossings
+    from reeb_gen import generate_refined_reeb_graph
+    from rgcn_select import count_crossings
+    for num_layers, layer_width, seed, k in ((4, 4, 0, 3), (5, 4, 1, 4), (5, 4, 1, 5), (4, 5, 1, 6)):
+        V_levels, edges = generate_refined_reeb_graph(num_layers, layer_width, seed=seed)
+        V = list(V_levels)
+        status = kernelize(V, edges, V_levels, k)["status"]
+        res = solve_rgcn_kernelized(V, edges, V_levels, k, extract_solution=True)
+        expected = solve_rgcn_optimized(V, edges, V_levels, k)
+        crossings = count_crossings(assignment_to_order(res, V_levels), edges, V_levels) if res else None
+        passed = status is None and bool(res) == expected and (not res or crossings <= k)
+        results.append({
+            "Test": f"Kernel {num_layers}x{layer_width} seed {seed}",
+            "k": k,
+            "Expected": expected,
+            "Result": bool(res),
+            "Crossings": crossings,
+            "Status": "✅ PASSED" if passed else "❌ FAILED"
+        })
+
+    for r in results:
+        print(r)
@@ -0,0 +1,65 @@
+# rgcn_layout.py
+# Drawing helpers shared by the solvers' tooling and reeb_visual, kept free
+# of solver imports so plotting does not need python-sat.
+from collections import defaultdict
+import numpy as np
+
+
+def crossing_pairs(edges, x, levels):
+    """
+    Return the index pairs (i, j), i < j, of edges that cross when every
+    vertex v is drawn at horizontal position x[v].
+
+    Edges are compared when they span the same two levels; for properly
+    layered instances these are exactly the solvers' edge groups.
+    """
+    groups = defaultdict(list)
+    for idx, (u, v) in enumerate(edges):
+        groups[tuple(sorted((levels[u], levels[v])))].append(idx)
+
+    pairs = []
+    for idx in groups.values():
+        if len(idx) < 2:
+            continue
+        idx = np.array(idx)
+        ends = np.array([(x[u], x[v]) if levels[u] <= levels[v] else (x[v], x[u])
+                         for u, v in (edges[i] for i in idx)], dtype=float)
+        # Two edges cross iff their endpoints are strictly inverted on the two levels
+        d_top = np.sign(ends[:, 0, None] - ends[None, :, 0])
+        d_bottom = np.sign(ends[:, 1, None] - ends[None, :, 1])
+        ii, jj = np.nonzero(np.triu(d_top * d_bottom < 0, k=1))
+        pairs.extend(zip(idx[ii].tolist(), idx[jj].tolist()))
+    return pairs
+
+
+def _mirror_odd_levels(order):
+    # The solvers count an edge pair as crossing when both endpoint pairs
+    # keep the same slot order, which matches a drawing with every other
+    # level reversed. Applying this twice gives back the input.
+    return {lvl: nodes[::-1] if rank % 2 == 1 else list(nodes)
+            for rank, (lvl, nodes) in enumerate(sorted(order.items()))}
+
+
+def order_to_assignment(order):
+    """
+    Convert a drawing order (level -> vertices left to right) to the
+    vertex -> slot assignment the solvers return.
+    """
+    assignment = {}
+    slot = 1
+    for lvl, nodes in _mirror_odd_levels(order).items():
+        for i, v in enumerate(nodes):
+            assignment[v] = slot + i
+        slot += len(nodes)
+    return assignment
+
+
+def assignment_to_order(assignment, levels):
+    """
+    Convert a solver assignment (vertex -> slot) to a drawing order, the
+    inverse of order_to_assignment.
+    """
+    by_slot = defaultdict(list)
+    for v in sorted(assignment, key=assignment.get):
+        by_slot[levels[v]].append(v)
+    return _mirror_odd_levels(by_slot)
@@ -83,11 +83,30 @@
 #         return pos_assignment
 
 from pysat.formula import CNF, IDPool
-from pysat.card import CardEnc
 from pysat.solvers import Solver
 import itertools
+import os
+import time
+from collections import defaultdict
+from rgcn_encoding import make_encoding, bounded_clauses, extract_assignment, save_encoding, load_encoding
+from rgcn_control import ENGINES, Unknown, make_stop_check, solve_with_budget
 
-def solve_rgcn_optimized(V, edges, levels, k, extract_solution=False):
+
+def _increasing_slots(ranges, low=1):
+    """
+    Yield increasing slot tuples whose j-th slot lies in the inclusive range ranges[j].
+    """
+    if not ranges:
+        yield ()
+        return
+    lo, hi = ranges[0]
+    for i in range(max(lo, low), hi + 1):
+        for rest in _increasing_slots(ranges[1:], i + 1):
+            yield (i,) + rest
+
+
+def encode_rgcn_optimized(V, edges, levels, on_encode=None, stop_reason=None,
+                          fixed_order=None, settled_pairs=None):
     pool = IDPool()
     cnf = CNF()
 
@@ -115,47 +134,125 @@ def solve_rgcn_optimized(V, edges, levels, k, extract_solution=False):
             for u, v in itertools.combinations(nodes, 2):
                 cnf.append([-pos_var(u, i), -pos_var(v, i)])
 
+    # Step 2b: Transitively closed (a, b) "a before b" pairs from rgcn_kernel,
+    # as unit clauses bounding each vertex's slot plus clauses per pair
+    bounds = {v: level_slots[levels[v]] for v in V}
+    if fixed_order:
+        n_before, n_after = defaultdict(int), defaultdict(int)
+        for a, b in fixed_order:
+            n_after[a] += 1
+            n_before[b] += 1
+        for v in V:
+            lo, hi = level_slots[levels[v]]
+            bounds[v] = (lo + n_before[v], hi - n_after[v])
+            for i in range(lo, hi + 1):
+                if not bounds[v][0] <= i <= bounds[v][1]:
+                    cnf.append([-pos_var(v, i)])
+        for a, b in fixed_order:
+            for i in range(bounds[a][0], bounds[a][1] + 1):
+                for j in range(bounds[b][0], min(i, bounds[b][1] + 1)):
+                    cnf.append([-pos_var(a, i), -pos_var(b, j)])
+    if on_encode:
+        on_encode("positions", len(cnf.clauses))
+
     # Step 3: Crossing variables (optimized)
     crossing_vars = []
     for (u1, v1), (u2, v2) in itertools.combinations(edges, 2):
         if levels[u1] != levels[u2] or levels[v1] != levels[v2]:
             continue  # not same level, skip
+        if u1 == u2 or v1 == v2:
+            continue  # shared endpoint, never crosses
+        if settled_pairs and frozenset(((u1, v1), (u2, v2))) in settled_pairs:
+            continue  # crossing decided by kernelization
 
         cvar = pool.id(f"c_{u1}_{v1}_{u2}_{v2}")
         crossing_vars.append(cvar)
 
-        # For each pair of positions a<b<c<d (slot ranges)
-        for i1 in range(1, current):
-            for i2 in range(i1 + 1, current):
-                for i3 in range(i2 + 1, current):
-                    for i4 in range(i3 + 1, current):
-                        # crossing case 1
-                        cnf.append([-pos_var(u1, i1), -pos_var(u2, i2),
-                                    -pos_var(v1, i3), -pos_var(v2, i4), cvar])
-                        # crossing case 2
-                        cnf.append([-pos_var(u2, i1), -pos_var(u1, i2),
-                                    -pos_var(v2, i3), -pos_var(v1, i4), cvar])
+        # For each a<b<c<d, only over the slots each vertex can take
+        # crossing case 1
+        for i1, i2, i3, i4 in _increasing_slots([bounds[u1], bounds[u2], bounds[v1], bounds[v2]]):
+            cnf.append([-pos_var(u1, i1), -pos_var(u2, i2),
+                        -pos_var(v1, i3), -pos_var(v2, i4), cvar])
+        # crossing case 2
+        for i1, i2, i3, i4 in _increasing_slots([bounds[u2], bounds[u1], bounds[v2], bounds[v1]]):
+            cnf.append([-pos_var(u2, i1), -pos_var(u1, i2),
+                        -pos_var(v2, i3), -pos_var(v1, i4), cvar])
+
+        # Report and check for cancellation once per edge pair
+        if on_encode:
+            on_encode("crossings", len(cnf.clauses))
+        if stop_reason and stop_reason():
+            return None
+
+    slot_ranges = {v: level_slots[levels[v]] for v in V}
+    return make_encoding(cnf, pool, crossing_vars, slot_ranges, V, edges, levels, "encode_rgcn_optimized")
+
+
+def solve_rgcn_optimized(V, edges, levels, k, extract_solution=False, encoding_path=None,
+                         engine="m22", time_budget=None, conflict_budget=None, cancel=None,
+                         on_encode=None, on_solve=None, on_solution=None,
+                         fixed_order=None, settled_pairs=None):
+    """
+    Decide whether the Reeb graph can be drawn with at most k crossings.
+
+    Returns True/False, or the vertex -> slot assignment if extract_solution
+    is set. engine is a pysat solver name from rgcn_control.ENGINES, the
+    ones that support limited solving. With time_budget (seconds), conflict_budget,
+    or a cancel Event, returns an Unknown carrying partial statistics when
+    stopped early.
+
+    Callbacks:
+        - on_encode(stage, num_clauses): after each encoding stage / edge pair
+        - on_solve(stats): solver conflicts, restarts, decisions, propagations
+        - on_solution(assignment): ordering found by the solver
+
+    fixed_order and settled_pairs carry the reductions computed by
+    rgcn_kernel.kernelize; see solve_rgcn_kernelized. They change the
+    clauses but not the instance key, so they cannot be combined with
+    encoding_path.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Engine {engine!r} does not support budgets; use one of {ENGINES}")
+    if encoding_path and (fixed_order or settled_pairs):
+        raise ValueError("encoding_path cannot be combined with fixed_order or settled_pairs")
+    start = time.monotonic()
+    deadline = start + time_budget if time_budget is not None else None
+    stop_reason = make_stop_check(deadline, cancel)
+
+    # Reuse an encoding from disk if one exists, otherwise build (and optionally save) it
+    if encoding_path and os.path.exists(encoding_path):
+        encoding = load_encoding(encoding_path, V, edges, levels, "encode_rgcn_optimized")
+    else:
+        encoding = encode_rgcn_optimized(V, edges, levels, on_encode, stop_reason,
+                                         fixed_order, settled_pairs)
+        if encoding is None:
+            return Unknown(stop_reason(), {}, time.monotonic() - start)
+        if encoding_path:
+            save_encoding(encoding_path, encoding)
 
     # Step 4: Total crossing count at most k
-    card = CardEnc.atmost(lits=crossing_vars, bound=k, vpool=pool, encoding=1)
-    cnf.extend(card.clauses)
+    clauses = bounded_clauses(encoding, k)
+    if on_encode:
+        on_encode("cardinality", len(clauses))
+    # Loading and bounding the encoding are not interruptible, so check before solving
+    if stop_reason():
+        return Unknown(stop_reason(), {}, time.monotonic() - start)
 
     # Step 5: Solve
-    with Solver(bootstrap_with=cnf.clauses) as solver:
-        sat = solver.solve()
+    with Solver(name=engine, bootstrap_with=clauses) as solver:
+        sat, stats = solve_with_budget(solver, stop_reason, deadline, conflict_budget, on_solve,
+                                        cancel=cancel)
+        if sat not in (True, False):
+            return Unknown(sat, stats, time.monotonic() - start)
         if not sat:
             return False
-        if not extract_solution:
+        if not extract_solution and not on_solution:
             return True
 
-        model = solver.get_model()
-        assignment = {}
-        for v in V:
-            for i in range(1, current):
-                if pos_var(v, i) in model:
-                    assignment[v] = i
-                    break
-        return assignment
+        assignment = extract_assignment(encoding, solver.get_model(), V)
+        if on_solution:
+            on_solution(assignment)
+        return assignment if extract_solution else True
 
 if __name__ == '__main__':
     # Define test cases
@@ -0,0 +1,314 @@
+# rgcn_select.py
+import json
+import math
+from collections import defaultdict
+import numpy as np
+from rgcn_layout import crossing_pairs, order_to_assignment
+from rgcn_solver import solve_rgcn_crossing_sat_local_levels
+from rgcn_opsolver import solve_rgcn_optimized
+
+
+SOLVERS = {
+    "standard": solve_rgcn_crossing_sat_local_levels,
+    "optimized": solve_rgcn_optimized,
+}
+
+DEFAULT_CHOICE = ("optimized", "m22")
+
+FEATURE_NAMES = [
+    "k", "num_vertices", "num_edges", "num_levels", "max_width", "mean_width",
+    "edge_density", "components", "heuristic_crossings", "lower_bound",
+]
+
+
+def _level_orders(V, levels):
+    level_to_nodes = defaultdict(list)
+    for v in V:
+        level_to_nodes[levels[v]].append(v)
+    return {lvl: sorted(nodes) for lvl, nodes in sorted(level_to_nodes.items())}
+
+
+def edge_groups(edges, levels):
+    """
+    Edges grouped by (level of u, level of v); the solvers only compare
+    edge pairs within a group.
+    """
+    groups = defaultdict(list)
+    for u, v in edges:
+        groups[(levels[u], levels[v])].append((u, v))
+    return groups
+
+
+def components(V, edges):
+    """
+    Connected components of the graph, as lists of vertices.
+    """
+    parent = {v: v for v in V}
+
+    def find(v):
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+    for u, v in edges:
+        parent[find(u)] = find(v)
+
+    comps = defaultdict(list)
+    for v in V:
+        comps[find(v)].append(v)
+    return list(comps.values())
+
+
+def is_proper_layering(V, edges, levels):
+    """
+    True when every edge (u, v) runs from a level to the next level below.
+
+    Only then do the drawing-based heuristic and lower bounds agree with
+    the solvers, which never count upward edges as crossing and compare
+    longer edges without mirroring.
+    """
+    rank = {lvl: i for i, lvl in enumerate(sorted(set(levels[v] for v in V)))}
+    return all(rank[levels[v]] - rank[levels[u]] == 1 for u, v in edges)
+
+
+def count_crossings(order, edges, levels):
+    """
+    Count crossing edge pairs when each level is drawn left to right in `order`.
+    """
+    x = {v: i for nodes in order.values() for i, v in enumerate(nodes)}
+    return len(crossing_pairs(edges, x, levels))
+
+
+def barycenter_order(V, edges, levels, sweeps=4):
+    """
+    Heuristic drawing order from alternating down/up barycenter sweeps.
+
+    Returns (order, crossings) for the best order seen, where order maps
+    level -> list of vertices from left to right.
+    """
+    order = _level_orders(V, levels)
+    nbrs = defaultdict(list)
+    for u, v in edges:
+        nbrs[u].append(v)
+        nbrs[v].append(u)
+
+    lvls = list(order)
+    x = {v: i for nodes in order.values() for i, v in enumerate(nodes)}
+    best, best_cross = {l: list(n) for l, n in order.items()}, count_crossings(order, edges, levels)
+    for sweep in range(sweeps):
+        # Down sweeps order each level by its upper neighbours, up sweeps by its lower ones
+        step = 1 if sweep % 2 == 0 else -1
+        seq = range(1, len(lvls)) if step == 1 else range(len(lvls) - 2, -1, -1)
+        for idx in seq:
+            lvl, ref = lvls[idx], lvls[idx - step]
+
+            def bary(v):
+                ps = [x[w] for w in nbrs[v] if levels[w] == ref]
+                return sum(ps) / len(ps) if ps else x[v]
+            order[lvl] = sorted(order[lvl], key=bary)
+            for i, v in enumerate(order[lvl]):
+                x[v] = i
+
+        cross = count_crossings(order, edges, levels)
+        if cross < best_cross:
+            best, best_cross = {l: list(n) for l, n in order.items()}, cross
+    return best, best_cross
+
+
+def level_pair_lower_bounds(edges, levels):
+    """
+    Lower bounds on the crossings within each solver edge group, keyed by
+    (level of u, level of v) for edges (u, v).
+
+    Two-layer drawings need one crossing per independent cycle of a
+    component (m - n + 1), m - 1 crossings for an even cycle of length 2m,
+    and one crossing for every 4-cycle, since a crossing edge pair
+    determines both of its vertex pairs. The best of these is used.
+    """
+    bounds = {}
+    for key, group in edge_groups(edges, levels).items():
+        group = set(group)  # parallel edges never cross
+        degree = defaultdict(int)
+        for u, v in group:
+            degree[u] += 1
+            degree[v] += 1
+
+        cycle_bound = 0
+        comp_of = {}
+        comps = components(degree, group)
+        for c, nodes in enumerate(comps):
+            for v in nodes:
+                comp_of[v] = c
+        comp_edges = defaultdict(int)
+        for u, v in group:
+            comp_edges[comp_of[u]] += 1
+        for c, nodes in enumerate(comps):
+            m = comp_edges[c]
+            is_cycle = all(degree[v] == 2 for v in nodes)
+            cycle_bound += m // 2 - 1 if is_cycle else m - len(nodes) + 1
+
+        uppers = defaultdict(list)
+        for u, v in group:
+            uppers[v].append(u)
+        shared = defaultdict(int)
+        for us in uppers.values():
+            us = sorted(us)
+            for i in range(len(us)):
+                for j in range(i + 1, len(us)):
+                    shared[(us[i], us[j])] += 1
+        four_cycles = sum(c * (c - 1) // 2 for c in shared.values())
+
+        bounds[key] = max(cycle_bound, four_cycles)
+    return bounds
+
+
+def crossing_lower_bound(edges, levels):
+    """
+    Lower bound on the crossing number, summed over level pairs.
+    """
+    return sum(level_pair_lower_bounds(edges, levels).values())
+
+
+def instance_features(V, edges, levels, k, heuristic=None):
+    """
+    Cheap structural features of an instance, used for solver selection.
+
+    heuristic is the (order, crossings) result of barycenter_order, if the
+    caller already has it.
+    """
+    order = _level_orders(V, levels)
+    widths = [len(nodes) for nodes in order.values()]
+    lvls = list(order)
+    possible = sum(len(order[a]) * len(order[b]) for a, b in zip(lvls, lvls[1:]))
+
+    if heuristic is None:
+        heuristic = barycenter_order(V, edges, levels)
+    return {
+        "k": k,
+        "num_vertices": len(V),
+        "num_edges": len(edges),
+        "num_levels": len(widths),
+        "max_width": max(widths, default=0),
+        "mean_width": sum(widths) / len(widths) if widths else 0,
+        "edge_density": len(edges) / possible if possible else 0,
+        "components": len(components(V, edges)),
+        "heuristic_crossings": heuristic[1],
+        "lower_bound": crossing_lower_bound(edges, levels),
+    }
+
+
+def train_selector(records, neighbours=5):
+    """
+    Build a nearest-neighbour selection model from benchmark records.
+
+    Each record is {"features": {...}, "times": {"solver/engine": seconds},
+    "status": {"solver/engine": "SAT" | "UNSAT" | "UNKNOWN" | "FAILED"},
+    "time_budget": seconds}, as written by benchmark_rgcn.py or
+    plot_benchmark_vary.py with --save_results. Runs that did not decide
+    the instance, or are missing from a record, are scored at twice the
+    time budget (PAR-2), or twice the slowest run if no budget is recorded.
+    """
+    choices = sorted({c for r in records for c in r["times"]})
+    points, costs = [], []
+    for r in records:
+        points.append([math.log1p(r["features"][f]) for f in FEATURE_NAMES])
+        penalty = 2 * (r.get("time_budget") or max(r["times"].values(), default=0))
+        row = []
+        for c in choices:
+            t = r["times"].get(c)
+            if t is None or r.get("status", {}).get(c, "SAT") not in ("SAT", "UNSAT"):
+                t = max(penalty, 2 * (t or 0))
+            row.append(t)
+        costs.append(row)
+
+    pts = np.array(points, dtype=float).reshape(-1, len(FEATURE_NAMES))
+    mean = pts.mean(axis=0) if len(pts) else np.zeros(len(FEATURE_NAMES))
+    scale = pts.std(axis=0) if len(pts) else np.ones(len(FEATURE_NAMES))
+    scale[scale == 0] = 1.0
+    return {
+        "feature_names": FEATURE_NAMES,
+        "choices": choices,
+        "mean": mean.tolist(),
+        "scale": scale.tolist(),
+        "points": ((pts - mean) / scale).tolist(),
+        "costs": costs,
+        "neighbours": neighbours,
+    }
+
+
+def save_selector(path, model):
+    with open(path, "w") as f:
+        json.dump(model, f)
+
+
+def load_selector(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def select_solver(features, model=None):
+    """
+    Return the (solver, engine) pair with the lowest mean PAR-2 cost among
+    the nearest benchmarked instances, or DEFAULT_CHOICE without a model.
+    """
+    if not model or not model["points"]:
+        return DEFAULT_CHOICE
+
+    x = (np.array([math.log1p(features[f]) for f in model["feature_names"]])
+         - np.array(model["mean"])) / np.array(model["scale"])
+    dist = np.linalg.norm(np.array(model["points"]) - x, axis=1)
+    nearest = np.argsort(dist)[:model["neighbours"]]
+
+    best, best_time = None, None
+    for j, choice in enumerate(model["choices"]):
+        mean_time = sum(model["costs"][i][j] for i in nearest) / len(nearest)
+        if best_time is None or mean_time < best_time:
+            best, best_time = choice, mean_time
+    if best is None:
+        return DEFAULT_CHOICE
+    solver, engine = best.split("/")
+    return solver, engine
+
+
+def solve_rgcn_auto(V, edges, levels, k, extract_solution=False, model=None, **kwargs):
+    """
+    Solve an instance with the solver and engine chosen from its features.
+
+    Properly layered instances decided by the lower bound or the
+    barycenter heuristic are answered without a SAT call. Remaining keyword arguments (budgets,
+    callbacks, encoding_path) are passed to the selected solver.
+    """
+    order, heuristic = barycenter_order(V, edges, levels)
+    features = instance_features(V, edges, levels, k, (order, heuristic))
+    proper = is_proper_layering(V, edges, levels)
+    if proper and features["lower_bound"] > k:
+        return False
+
+    if proper and heuristic <= k:
+        if not extract_solution and not kwargs.get("on_solution"):
+            return True
+        assignment = order_to_assignment(order)
+        if kwargs.get("on_solution"):
+            kwargs["on_solution"](assignment)
+        return assignment if extract_solution else True
+
+    solver, engine = select_solver(features, model)
+    return SOLVERS[solver](V, edges, levels, k, extract_solution=extract_solution,
+                           engine=engine, **kwargs)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Train a solver selection model from benchmark results.")
+    parser.add_argument('results', nargs='+', help='JSON files written by benchmark_rgcn.py --save_results')
+    parser.add_argument('--out', type=str, default='rgcn_selector.json', help='Output model path')
+    parser.add_argument('--neighbours', type=int, default=5, help='Number of nearest instances to vote')
+    args = parser.parse_args()
+
+    records = []
+    for path in args.results:
+        with open(path) as f:
+            records.extend(json.load(f))
+    model = train_selector(records, args.neighbours)
+    save_selector(args.out, model)
+    print(f"Trained selector on {len(records)} instances over {len(model['choices'])} choices: {args.out}")
@@ -1,11 +1,14 @@
 from pysat.formula import IDPool, CNF
-from pysat.card import CardEnc
 from pysat.solvers import Solver
 import itertools
+import os
+import time
 from collections import defaultdict
+from rgcn_encoding import make_encoding, bounded_clauses, extract_assignment, save_encoding, load_encoding
+from rgcn_control import ENGINES, Unknown, make_stop_check, solve_with_budget
 
 
-def solve_rgcn_crossing_sat_local_levels(V, edges, levels, k, extract_solution=False):
+def encode_rgcn_local_levels(V, edges, levels, on_encode=None, stop_reason=None):
     pool = IDPool()
     cnf = CNF()
 
@@ -42,6 +45,8 @@ def solve_rgcn_crossing_sat_local_levels(V, edges, levels, k, extract_solution=F
         for i in positions:
             for u, v in itertools.combinations(level_groups[lvl], 2):
                 cnf.append([-pos_var(u, i), -pos_var(v, i)])
+    if on_encode:
+        on_encode("positions", len(cnf.clauses))
 
     # Step 4: crossing constraints
     crossing_vars = []
@@ -52,7 +57,10 @@ def solve_rgcn_crossing_sat_local_levels(V, edges, levels, k, extract_solution=F
         x = pool.id(f"c_{u1}_{v1}_{u2}_{v2}")
         crossing_vars.append(x)
 
-        for i1, i2, i3, i4 in itertools.permutations(range(1, pos_counter), 4):
+        for n, (i1, i2, i3, i4) in enumerate(itertools.permutations(range(1, pos_counter), 4)):
+            # A single edge pair can take seconds on wide graphs, so check inside it too
+            if stop_reason and n % 100000 == 0 and stop_reason():
+                return None
             if not (i1 < i2 < i3 < i4):
                 continue
             cnf.append([-pos_var(u1, i1), -pos_var(u2, i2),
@@ -60,27 +68,65 @@ def solve_rgcn_crossing_sat_local_levels(V, edges, levels, k, extract_solution=F
             cnf.append([-pos_var(u2, i1), -pos_var(u1, i2),
                         -pos_var(v2, i3), -pos_var(v1, i4), x])
 
+        # Report and check for cancellation once per edge pair
+        if on_encode:
+            on_encode("crossings", len(cnf.clauses))
+        if stop_reason and stop_reason():
+            return None
+
+    return make_encoding(cnf, pool, crossing_vars, position_ranges, V, edges, levels, "encode_rgcn_local_levels")
+
+
+def solve_rgcn_crossing_sat_local_levels(V, edges, levels, k, extract_solution=False, encoding_path=None,
+                                         engine="m22", time_budget=None, conflict_budget=None, cancel=None,
+                                         on_encode=None, on_solve=None, on_solution=None):
+    """
+    Decide whether the Reeb graph can be drawn with at most k crossings.
+
+    Takes the same engine, budget, cancellation and callback arguments as
+    rgcn_opsolver.solve_rgcn_optimized.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Engine {engine!r} does not support budgets; use one of {ENGINES}")
+    start = time.monotonic()
+    deadline = start + time_budget if time_budget is not None else None
+    stop_reason = make_stop_check(deadline, cancel)
+
+    # Reuse an encoding from disk if one exists, otherwise build (and optionally save) it
+    if encoding_path and os.path.exists(encoding_path):
+        encoding = load_encoding(encoding_path, V, edges, levels, "encode_rgcn_local_levels")
+    else:
+        encoding = encode_rgcn_local_levels(V, edges, levels, on_encode, stop_reason)
+        if encoding is None:
+            return Unknown(stop_reason(), {}, time.monotonic() - start)
+        if encoding_path:
+            save_encoding(encoding_path, encoding)
+
     # Step 5: crossing number bound
-    card = CardEnc.atmost(lits=crossing_vars, bound=k, vpool=pool, encoding=1)
-    cnf.extend(card.clauses)
+    clauses = bounded_clauses(encoding, k)
+    if on_encode:
+        on_encode("cardinality", len(clauses))
+    # Loading and bounding the encoding are not interruptible, so check before solving
+    if stop_reason():
+        return Unknown(stop_reason(), {}, time.monotonic() - start)
 
     # Step 6: solve
-    with Solver(bootstrap_with=cnf.clauses) as solver:
-        if not solver.solve():
+    with Solver(name=engine, bootstrap_with=clauses) as solver:
+        sat, stats = solve_with_budget(solver, stop_reason, deadline, conflict_budget, on_solve,
+                                        cancel=cancel)
+        if sat not in (True, False):
+            return Unknown(sat, stats, time.monotonic() - start)
+        if not sat:
             return False
 
         model = solver.get_model()
-        if not extract_solution:
+        if not extract_solution and not on_solution:
             return True
 
-        pos_assignment = {}
-        for v in V:
-            for i in range(*position_ranges[v]):
-                if pos_var(v, i) in model:
-                    pos_assignment[v] = i
-                    break
-
-        return pos_assignment
+        assignment = extract_assignment(encoding, model, V)
+        if on_solution:
+            on_solution(assignment)
+        return assignment if extract_solution else True
 
 if __name__ == '__main__':
     # Define test cases